@@ -1,6 +1,14 @@
 from randvar.core import EmptyDistributionError, ZeroDistributionError, \
-    NegativeWeightError, RandomVariable, rand_apply, randomable
+    NegativeWeightError, RandomVariable, rand_apply, rand_apply_many, \
+    randomable, get_copy_policy, set_copy_policy, SampledRandomVariable
 from randvar.distributions import const, uniform, poisson_trunc, \
     poisson_stretch
 from randvar.statistics import mean, expected_value, percentile, median, \
     mode, variance, stddev
+from randvar.operations import order_statistic, rand_max, rand_min, \
+    mixture, compound_sum
+from randvar.markov import MarkovChain
+from randvar.batch import RandomVariableBatch
+from randvar.dice import DiceSyntaxError, DicePlan, compile_expr, expr
+from randvar.metrics import total_variation, kl_divergence, js_divergence, \
+    hellinger, wasserstein, compare, compare_many
@@ -0,0 +1,249 @@
+from array import array
+from bisect import bisect_right
+from random import random
+import itertools
+import math
+import operator
+
+from randvar import EmptyDistributionError, ZeroDistributionError, \
+    NegativeWeightError, RandomVariable
+
+
+class RandomVariableBatch:
+    """
+    Many random variables with finite numeric domains, packed into flat
+    arrays so that statistics over all of them run as a few passes over the
+    arrays.
+
+    The values of the `i`th random variable are
+    `values[offsets[i]:offsets[i + 1]]`, in increasing order, with the
+    matching `weights`. The values are kept exactly as given, and a float
+    copy of them is used for the moment arithmetic. The original order of
+    the values of each random variable is kept in `ranks`, so that ties are
+    broken as they are for single random variables.
+    """
+
+    def __init__(self, variables):
+        """
+        Packs the numeric random variables in the iterable `variables` into
+        a batch.
+        """
+
+        values = []
+        weights = array("d")
+        ranks = array("q")
+        offsets = array("q", [0])
+        for var in variables:
+            for val, rank, weight in sorted(
+                    (val, rank, weight) for rank, (val, weight) in
+                    enumerate(var._dist.items())):
+                values.append(val)
+                weights.append(weight)
+                ranks.append(rank)
+            offsets.append(len(values))
+        self._init(values, weights, ranks, offsets)
+
+    @classmethod
+    def from_arrays(cls, values, weights, offsets):
+        """
+        Creates a batch directly from flat sequences of `values` and
+        `weights`, where `offsets` has one more entry than there are random
+        variables and the `i`th random variable takes the values
+        `values[offsets[i]:offsets[i + 1]]`. The values of each random
+        variable need not be sorted. As for `RandomVariable`, values with 
+        zero weight are removed, and the weights of repeated values are 
+        added together.
+        """
+
+        if len(values) != len(weights):
+            raise ValueError("values and weights differ in length")
+        offsets = array("q", offsets)
+        if len(offsets) == 0 or offsets[0] != 0 or \
+                offsets[-1] != len(values):
+            raise ValueError("offsets must run from 0 to len(values)")
+
+        sorted_values = []
+        sorted_weights = array("d")
+        sorted_ranks = array("q")
+        sorted_offsets = array("q", [0])
+        for i in range(len(offsets) - 1):
+            start, stop = offsets[i], offsets[i + 1]
+            if stop <= start:
+                raise EmptyDistributionError()
+            entries = sorted(zip(values[start:stop], itertools.count(),
+                                 weights[start:stop]))
+            for val, rank, weight in entries:
+                if weight < 0:
+                    raise NegativeWeightError(weight)
+            if sum(weight for val, rank, weight in entries) == 0:
+                raise ZeroDistributionError()
+
+            # Equal values are adjacent after sorting, with the first
+            # occurrence leading
+            for val, group in itertools.groupby(entries,
+                                                key=operator.itemgetter(0)):
+                group = tuple(group)
+                weight = sum(entry[2] for entry in group)
+                if weight == 0:
+                    continue
+                sorted_values.append(val)
+                sorted_weights.append(weight)
+                sorted_ranks.append(group[0][1])
+            sorted_offsets.append(len(sorted_values))
+
+        batch = cls.__new__(cls)
+        batch._init(sorted_values, sorted_weights, sorted_ranks,
+                    sorted_offsets)
+        return batch
+
+    def _init(self, values, weights, ranks, offsets):
+        self._values = values
+        self._floats = array("d", values)
+        self._weights = weights
+        self._ranks = ranks
+        self._offsets = offsets
+
+        # Cumulative weights within each random variable, used by
+        # `percentile` and `sample`
+        self._cum = array("d")
+        self._weight_sums = array("d")
+        for start, stop in self._bounds():
+            self._cum.extend(itertools.accumulate(weights[start:stop]))
+            total = self._cum[-1]
+            if total == 0:
+                raise ZeroDistributionError()
+            self._weight_sums.append(total)
+
+    def _bounds(self):
+        """
+        Returns an iterator over the `(start, stop)` slice bounds of each
+        random variable in the flat arrays.
+        """
+
+        return zip(self._offsets, itertools.islice(self._offsets, 1, None))
+
+    def __len__(self):
+        """
+        Returns the number of random variables in the batch.
+        """
+
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        """
+        Returns the `i`th random variable in the batch.
+        """
+
+        start, stop = self._offsets[i], self._offsets[i + 1]
+        order = sorted(range(start, stop), key=self._ranks.__getitem__)
+        return RandomVariable({self._values[ind]: self._weights[ind]
+                               for ind in order})
+
+    def __iter__(self):
+        """
+        Returns an iterator over the random variables in the batch.
+        """
+
+        return (self[i] for i in range(len(self)))
+
+    def _moment(self, func=None):
+        """
+        Returns the expected value of `func` applied to each random variable
+        in the batch, or of the value itself if `func` is `None`.
+        """
+
+        values = self._floats
+        if func is not None:
+            values = array("d", map(func, values))
+        return [sum(map(operator.mul, values[start:stop],
+                        self._weights[start:stop])) / total
+                for (start, stop), total in zip(self._bounds(),
+                                                self._weight_sums)]
+
+    def mean(self, p=1):
+        """
+        Returns the list of generalized `p`-means of the random variables in
+        the batch, as `statistics.mean`.
+        """
+
+        if p == float("inf"):
+            return [self._values[stop - 1] for start, stop in self._bounds()]
+        if p == float("-inf"):
+            return [self._values[start] for start, stop in self._bounds()]
+        if p == 0:
+            return [math.exp(m) for m in self._moment(math.log)]
+        return [m ** (1 / p) for m in self._moment(lambda val: val ** p)]
+
+    def expected_value(self):
+        """
+        Returns the list of expected values of the random variables in the
+        batch.
+        """
+
+        return self._moment()
+
+    def percentile(self, p):
+        """
+        Returns the list of `p` percentile values of the random variables in
+        the batch (i.e. `0 <= p <= 1`), as `statistics.percentile`.
+        """
+
+        results = []
+        for (start, stop), total in zip(self._bounds(), self._weight_sums):
+            ind = bisect_right(self._cum, p * total, start, stop)
+            results.append(self._values[min(ind, stop - 1)])
+        return results
+
+    def median(self):
+        """
+        Returns the list of median values of the random variables in the
+        batch.
+        """
+
+        return self.percentile(0.5)
+
+    def mode(self, k=1):
+        """
+        Returns the list of `k`th most probable values of the random
+        variables in the batch, as `statistics.mode`. Ties are broken in
+        favour of the value that came first in the original random variable.
+        """
+
+        results = []
+        for start, stop in self._bounds():
+            order = sorted(range(start, stop),
+                           key=lambda ind: (-self._weights[ind],
+                                            self._ranks[ind]))
+            results.append(self._values[order[k - 1]])
+        return results
+
+    def variance(self):
+        """
+        Returns the list of variances of the random variables in the batch.
+        """
+
+        return [sq - m * m for sq, m in zip(self._moment(lambda val: val * val),
+                                            self._moment())]
+
+    def stddev(self):
+        """
+        Returns the list of standard deviations of the random variables in
+        the batch.
+        """
+
+        return [math.sqrt(var) for var in self.variance()]
+
+    def sample(self, size=1):
+        """
+        Returns a list holding a random sample of `size` values from each
+        random variable in the batch.
+        """
+
+        results = []
+        for (start, stop), total in zip(self._bounds(), self._weight_sums):
+            last = stop - 1
+            results.append([
+                self._values[min(bisect_right(self._cum, random() * total,
+                                              start, stop), last)]
+                for _ in range(size)])
+        return results
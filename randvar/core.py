@@ -1,12 +1,26 @@
-from copy import deepcopy
-from random import random
+from bisect import bisect_right
+from copy import copy as shallowcopy, deepcopy
+from random import Random, random
 from collections import namedtuple
 import operator
 import itertools
 import functools
+import math
 
 DEFAULT_VIABILITY = 0.00001
 
+# Defaults for `rand_apply` with `method="montecarlo"` or `method="auto"`
+DEFAULT_SAMPLES = 10000
+DEFAULT_ENUMERATION_BUDGET = 1000000
+
+COPY_POLICIES = ("deep", "shallow", "none", "auto")
+
+# Types whose instances can be handed out without copying
+_IMMUTABLE_TYPES = (bool, int, float, complex, str, bytes, range,
+                    type(None), type)
+
+_copy_policy = "auto"
+
 
 class ZeroDistributionError(Exception):
     pass
@@ -20,12 +34,58 @@ class NegativeWeightError(Exception):
     pass
 
 
+def _check_copy_policy(policy):
+    if policy is not None and policy not in COPY_POLICIES:
+        raise ValueError("unknown copy policy %r, expected one of %s" %
+                         (policy, ", ".join(COPY_POLICIES)))
+
+
+def get_copy_policy():
+    """
+    Returns the global copy policy, used wherever no other copy policy is
+    given.
+    """
+
+    return _copy_policy
+
+
+def set_copy_policy(policy):
+    """
+    Sets the global copy policy. Values handed out by `RandomVariable.choice`
+    and `RandomVariable.sample`, and passed to functions by `rand_apply`, are
+    copied according to the policy:
+
+    - `"deep"` deep copies every value.
+    - `"shallow"` makes a shallow copy of every value.
+    - `"none"` hands out the stored values themselves, so they must not be
+      mutated.
+    - `"auto"` (the default) skips copying when every value of the random
+      variable is immutable, and deep copies otherwise.
+    """
+
+    global _copy_policy
+    _check_copy_policy(policy)
+    if policy is None:
+        raise ValueError("the global copy policy cannot be None")
+    _copy_policy = policy
+
+
+def _is_immutable(val):
+    if type(val) in (tuple, frozenset):
+        return all(_is_immutable(item) for item in val)
+    return isinstance(val, type) or type(val) in _IMMUTABLE_TYPES
+
+
+def _identity(val):
+    return val
+
+
 class RandomVariable:
     """
     A random variable with finite domain.
     """
 
-    def __init__(self, dist):
+    def __init__(self, dist, copy=None):
         """
         Creates a finite random variable with the distribution `dist`, 
         which should be dictionary with any keys to positive numeric 
@@ -37,9 +97,16 @@ class RandomVariable:
         as "values" and the values of the distribution dictionary are referred
         to as "weights". The numbers `dist[val] / total` as above are 
         referred to as "probabilities".
+
+        The optional `copy` is the copy policy for values drawn from this
+        random variable, as in `set_copy_policy`. If it is `None`, the 
+        global copy policy is used.
         """
 
         # Verify the distribution is valid and initialize
+        _check_copy_policy(copy)
+        self._copy = copy
+        self._immutable = None
         if len(dist) == 0:
             raise EmptyDistributionError()
         for prob in dist.values():
@@ -59,6 +126,10 @@ class RandomVariable:
         for val in zeros:
             del self._dist[val]
 
+        # Cumulative weights for drawing samples in bulk, built on first use
+        self._cum = None
+        self._cum_values = None
+
         # Create a search tree for `self.choice()`
         self._search = []
         SearchNode = namedtuple("SearchNode", ["value", "lower", "upper"])
@@ -124,13 +195,33 @@ class RandomVariable:
     def __repr__(self):
         return "RandomVariable(%s)" % str(self._dist)
 
-    def choice(self):
+    def _copier(self, copy=None):
         """
-        Returns a random element from the distribution.
+        Returns the function used to copy values of the distribution under
+        the copy policy `copy`, falling back to the policy of this random
+        variable and then to the global copy policy.
+        """
+
+        _check_copy_policy(copy)
+        policy = copy or self._copy or _copy_policy
+        if policy == "auto":
+            if self._immutable is None:
+                self._immutable = all(_is_immutable(val)
+                                      for val in self._dist)
+            policy = "none" if self._immutable else "deep"
+        if policy == "deep":
+            return deepcopy
+        if policy == "shallow":
+            return shallowcopy
+        return _identity
+
+    def _select(self, x):
+        """
+        Returns the value whose cumulative weight range contains `x`, which
+        should be at least `0` and less than the total weight.
         """
 
         # Uses binary search
-        x = random() * self._weight_sum
         bot = 0
         top = len(self._search)
         ind = (bot + top) // 2
@@ -142,23 +233,110 @@ class RandomVariable:
                 bot = ind + 1
             ind = (bot + top) // 2
             item = self._search[ind]
-        return deepcopy(item.value)
+        return item.value
+
+    def choice(self, copy=None):
+        """
+        Returns a random element from the distribution, copied according to
+        the copy policy `copy` (see `set_copy_policy`). If `copy` is `None`,
+        the policy of the random variable is used.
+        """
+
+        return self._copier(copy)(self._select(random() * self._weight_sum))
+
+    def sample(self, size=1, copy=None):
+        """
+        Returns a random sample of `size` elements from the distribution,
+        copied as in `choice`.
+        """
+
+        return self._draw(size, self._copier(copy))
+
+    def _draw(self, size, copier, rand=random):
+        """
+        Returns a list of `size` values drawn from the distribution and 
+        copied with `copier`, using the uniform random number function 
+        `rand`.
+        """
 
-    def sample(self, size=1):
+        # Uses the C implementation of binary search over the cumulative
+        # weights
+        if self._cum is None:
+            self._cum_values = [item.value for item in self._search]
+            self._cum = [item.upper for item in self._search]
+        values = self._cum_values
+        cum = self._cum
+        total = self._weight_sum
+        last = len(values) - 1
+        draws = [values[min(bisect_right(cum, rand() * total), last)]
+                 for _ in range(size)]
+        if copier is not _identity:
+            draws = [copier(val) for val in draws]
+        return draws
+
+    def iter_samples(self, batch_size=1024, copy=None):
         """
-        Returns a random sample of `size` elements from the distribution.
+        Returns an endless iterator of random elements from the 
+        distribution, copied as in `choice`. Elements are drawn `batch_size`
+        at a time into a buffer, which keeps memory use constant.
         """
 
-        return [self.choice() for _ in range(size)]
+        if batch_size < 1:
+            raise ValueError("batch size must be positive, got %r" %
+                             (batch_size,))
+        copier = self._copier(copy)
 
+        # Check the arguments above when called, not on the first `next`
+        def samples():
+            while True:
+                yield from self._draw(batch_size, copier)
 
-def rand_apply(func, *args, **kwargs):
+        return samples()
+
+    def aiter_samples(self, batch_size=1024, copy=None):
+        """
+        As `iter_samples`, but an asynchronous iterator, which yields control
+        to the event loop each time the buffer is refilled.
+        """
+
+        if batch_size < 1:
+            raise ValueError("batch size must be positive, got %r" %
+                             (batch_size,))
+        return _AsyncSampleIterator(self, batch_size, self._copier(copy))
+
+
+class _AsyncSampleIterator:
+    """
+    The asynchronous iterator returned by `RandomVariable.aiter_samples`.
     """
-    Applies a function to random variable arguments, returning a random 
-    variable representing the distribution of return values from the function.
 
-    All non-random variable arguments to the function are treated as 
-    constant distributions.
+    def __init__(self, var, batch_size, copier):
+        self._var = var
+        self._batch_size = batch_size
+        self._copier = copier
+        self._buffer = []
+        self._pos = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._pos == len(self._buffer):
+            # Only needed here, so `import randvar` doesn't load asyncio
+            import asyncio
+            await asyncio.sleep(0)
+            self._buffer = self._var._draw(self._batch_size, self._copier)
+            self._pos = 0
+        val = self._buffer[self._pos]
+        self._pos += 1
+        return val
+
+
+def _rand_args(args, kwargs):
+    """
+    Converts the arguments `args` and `kwargs` to random variables, 
+    returning the list of positional random variables, the list of keyword
+    names and the dictionary of keyword random variables.
     """
 
     # Convert all `args` to `RandomVariable`s if they aren't already
@@ -178,14 +356,38 @@ def rand_apply(func, *args, **kwargs):
         else:
             rand_kwargs[name] = RandomVariable({kwargs[name]: 1})
 
-    # Compute the new distribution
-    dist = {}
+    return rand_args, ordered_names, rand_kwargs
+
+
+def _joint_items(args, kwargs, copy=None):
+    """
+    Iterates over the joint product of the random variable arguments `args`
+    and `kwargs`, yielding `(args_inst, kwargs_inst, weight)` for each
+    combination of values with non-zero weight. The values are copied under
+    the copy policy `copy`, or the policy of each random variable if `copy`
+    is `None`.
+
+    All non-random variable arguments are treated as constant distributions.
+    """
+
+    rand_args, ordered_names, rand_kwargs = _rand_args(args, kwargs)
+
+    # Find how each argument is copied, skipping the copy step entirely
+    # when no argument needs it
+    args_copiers = tuple(var._copier(copy) for var in rand_args)
+    if all(copier is _identity for copier in args_copiers):
+        args_copiers = None
+    kwargs_copiers = tuple(rand_kwargs[name]._copier(copy)
+                           for name in ordered_names)
+
     for args_items in itertools.product(
             *tuple(var._dist.items() for var in rand_args)):
         # Get the tuple of arguments and their weights for this iteration
         if len(args_items) > 0:
             args_inst, args_wts = tuple(zip(*args_items))
-            args_inst = deepcopy(args_inst)
+            if args_copiers is not None:
+                args_inst = tuple(copier(val) for copier, val in
+                                  zip(args_copiers, args_inst))
         else:
             args_inst = []
             args_wts = []
@@ -196,26 +398,251 @@ def rand_apply(func, *args, **kwargs):
             # this iteration
             if len(kwargs_items) > 0:
                 kwargs_inst, kwargs_wts = tuple(zip(*kwargs_items))
-                kwargs_inst = {name: deepcopy(kwargs_inst[i]) for i, name in
-                               enumerate(ordered_names)}
+                kwargs_inst = {name: kwargs_copiers[i](kwargs_inst[i])
+                               for i, name in enumerate(ordered_names)}
             else:
                 kwargs_inst = {}
                 kwargs_wts = []
 
-            # Compute new weight and incorporate into `dist`
             weight = functools.reduce(operator.mul,
-                                    itertools.chain(args_wts, kwargs_wts),
-                                    1)
+                                      itertools.chain(args_wts, kwargs_wts),
+                                      1)
             if weight > 0:
-                val = func(*args_inst, **kwargs_inst)
-                if val not in dist:
-                    dist[val] = weight
-                else:
-                    dist[val] += weight
+                yield args_inst, kwargs_inst, weight
+
+
+def _normal_quantile(p):
+    """
+    Returns the `p` quantile of the standard normal distribution.
+    """
+
+    # Bisection on the cumulative distribution function
+    bot, top = -40.0, 40.0
+    for _ in range(100):
+        mid = (bot + top) / 2
+        if (1 + math.erf(mid / math.sqrt(2))) / 2 < p:
+            bot = mid
+        else:
+            top = mid
+    return (bot + top) / 2
+
+
+class SampledRandomVariable(RandomVariable):
+    """
+    A random variable estimated from independent samples, as returned by
+    `rand_apply` with `method="montecarlo"`.
+    """
+
+    def __init__(self, counts, copy=None):
+        """
+        Creates the empirical random variable of a sample, where `counts`
+        is a dictionary from each sampled value to the number of times it 
+        was sampled.
+        """
+
+        super().__init__(counts, copy=copy)
+        self.samples = self._weight_sum
+
+    def probability_bounds(self, val, level=0.95):
+        """
+        Returns a `(lower, upper)` confidence interval at confidence `level`
+        for the true probability of `val`, using the Wilson score interval.
+        """
+
+        z = _normal_quantile((1 + level) / 2)
+        n = self.samples
+        p = self[val]
+        centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+        spread = z / (1 + z * z / n) * math.sqrt(p * (1 - p) / n +
+                                                 z * z / (4 * n * n))
+        return max(centre - spread, 0), min(centre + spread, 1)
+
+    def moment_bounds(self, p=1, level=0.95):
+        """
+        Returns a `(lower, upper)` confidence interval at confidence `level`
+        for the true `p`th raw moment (the expected value of `val ** p`),
+        using the normal approximation. The values must be numeric.
+        """
+
+        z = _normal_quantile((1 + level) / 2)
+        n = self.samples
+        powers = [(val ** p, count) for val, count in self._dist.items()]
+        mean = sum(power * count for power, count in powers) / n
+        if n > 1:
+            var = sum(count * (power - mean) ** 2
+                      for power, count in powers) / (n - 1)
+        else:
+            var = 0
+        spread = z * math.sqrt(var / n)
+        return mean - spread, mean + spread
+
+    def expected_value_bounds(self, level=0.95):
+        """
+        Returns a `(lower, upper)` confidence interval at confidence `level`
+        for the true expected value, as `moment_bounds` with `p=1`.
+        """
+
+        return self.moment_bounds(1, level)
+
+    def variance_bounds(self, level=0.95):
+        """
+        Returns a `(lower, upper)` confidence interval at confidence `level`
+        for the true variance, using the normal approximation to the 
+        sample variance. The values must be numeric.
+        """
+
+        z = _normal_quantile((1 + level) / 2)
+        n = self.samples
+        if n < 4:
+            return 0, float("inf")
+        mean = sum(val * count for val, count in self._dist.items()) / n
+        var = sum(count * (val - mean) ** 2
+                  for val, count in self._dist.items()) / (n - 1)
+        fourth = sum(count * (val - mean) ** 4
+                     for val, count in self._dist.items()) / n
+        spread = z * math.sqrt(max(fourth - var * var * (n - 3) / (n - 1),
+                                   0) / n)
+        return max(var - spread, 0), var + spread
+
+
+def _rand_apply_sampled(func, args, kwargs, samples, seed, copy):
+    """
+    Estimates the distribution of `func` applied to the random variable
+    arguments `args` and `kwargs` from `samples` independent joint draws.
+    """
+
+    if samples < 1:
+        raise ValueError("need at least one sample, got %r" % (samples,))
+    rand_args, ordered_names, rand_kwargs = _rand_args(args, kwargs)
+    rng = Random(seed)
+
+    # Draw every sample of each argument at once with the bulk sampler
+    args_columns = [var._draw(samples, var._copier(copy), rng.random)
+                    for var in rand_args]
+    kwargs_columns = [rand_kwargs[name]._draw(
+        samples, rand_kwargs[name]._copier(copy), rng.random)
+        for name in ordered_names]
+    if len(args_columns) > 0:
+        args_rows = zip(*args_columns)
+    else:
+        args_rows = itertools.repeat((), samples)
+    if len(kwargs_columns) > 0:
+        kwargs_rows = zip(*kwargs_columns)
+    else:
+        kwargs_rows = itertools.repeat((), samples)
+
+    counts = {}
+    for args_inst, kwargs_vals in zip(args_rows, kwargs_rows):
+        kwargs_inst = dict(zip(ordered_names, kwargs_vals))
+        val = func(*args_inst, **kwargs_inst)
+        if val not in counts:
+            counts[val] = 1
+        else:
+            counts[val] += 1
+
+    return SampledRandomVariable(counts)
+
+
+def rand_apply(func, *args, method="exact", samples=DEFAULT_SAMPLES,
+               seed=None, budget=DEFAULT_ENUMERATION_BUDGET, copy=None,
+               **kwargs):
+    """
+    Applies a function to random variable arguments, returning a random 
+    variable representing the distribution of return values from the function.
+
+    All non-random variable arguments to the function are treated as 
+    constant distributions. The arguments are copied under the copy policy
+    `copy` (see `set_copy_policy`), or the policy of each random variable if
+    `copy` is `None`.
+
+    With `method="exact"` (the default) every combination of argument values
+    is enumerated. With `method="montecarlo"`, the function is instead 
+    applied to `samples` independent joint draws of the arguments, using a
+    random number generator seeded with `seed`, and a 
+    `SampledRandomVariable` with confidence bounds is returned. With 
+    `method="auto"`, sampling is used only when the number of combinations
+    exceeds `budget`.
+
+    Because of these options, the function cannot be passed keyword 
+    arguments named `method`, `samples`, `seed`, `budget` or `copy`. 
+    Functions wrapped with `randomable` are not affected, and always get
+    every keyword argument.
+    """
+
+    if method == "auto":
+        size = 1
+        for arg in itertools.chain(args, kwargs.values()):
+            if isinstance(arg, RandomVariable):
+                size *= len(arg)
+        method = "exact" if size <= budget else "montecarlo"
+    if method == "montecarlo":
+        return _rand_apply_sampled(func, args, kwargs, samples, seed, copy)
+    if method != "exact":
+        raise ValueError("unknown method %r, expected 'exact', 'montecarlo' "
+                         "or 'auto'" % (method,))
+
+    return _rand_apply_exact(func, args, kwargs, copy)
+
+
+def _rand_apply_exact(func, args, kwargs, copy=None):
+    """
+    Applies `func` to every combination of the random variable arguments
+    `args` and `kwargs`. Unlike `rand_apply`, every keyword argument in
+    `kwargs` is passed to `func`.
+    """
+
+    # Compute the new distribution
+    dist = {}
+    for args_inst, kwargs_inst, weight in _joint_items(args, kwargs, copy):
+        val = func(*args_inst, **kwargs_inst)
+        if val not in dist:
+            dist[val] = weight
+        else:
+            dist[val] += weight
 
     return RandomVariable(dist)
 
 
+def rand_apply_many(funcs, *args, joint=False, copy=None, **kwargs):
+    """
+    Applies each function in `funcs` to the same random variable arguments,
+    returning a list of random variables representing the distributions of
+    return values from each function. The joint product of the arguments is
+    enumerated only once for all the functions.
+
+    If `joint` is true, returns a pair `(outputs, joint_var)` instead, where
+    `outputs` is the list above and `joint_var` is a random variable over
+    the tuples of return values of all the functions.
+
+    The functions share one copy of the arguments for each combination, so
+    they should not mutate them. All non-random variable arguments to the 
+    functions are treated as constant distributions. The arguments are 
+    copied as in `rand_apply`. Because of `joint` and `copy`, the functions
+    cannot be passed keyword arguments with those names.
+    """
+
+    funcs = tuple(funcs)
+    dists = [{} for _ in funcs]
+    joint_dist = {}
+    for args_inst, kwargs_inst, weight in _joint_items(args, kwargs, copy):
+        vals = tuple(func(*args_inst, **kwargs_inst) for func in funcs)
+        for dist, val in zip(dists, vals):
+            if val not in dist:
+                dist[val] = weight
+            else:
+                dist[val] += weight
+        if joint:
+            if vals not in joint_dist:
+                joint_dist[vals] = weight
+            else:
+                joint_dist[vals] += weight
+
+    outputs = [RandomVariable(dist) for dist in dists]
+    if joint:
+        return outputs, RandomVariable(joint_dist)
+    return outputs
+
+
 def randomable(func):
     """
     A function wrapper so that the functions returns a random variable 
@@ -223,7 +650,8 @@ def randomable(func):
     all the arguments are random variables.
 
     All non-random variable arguments to the function are treated as having 
-    constant distributions.
+    constant distributions. Every keyword argument is passed on to the 
+    function, including those that `rand_apply` reserves for its own options.
     """
 
-    return lambda *args, **kwargs: rand_apply(func, *args, **kwargs)
+    return lambda *args, **kwargs: _rand_apply_exact(func, args, kwargs)
@@ -0,0 +1,414 @@
+import functools
+import operator
+import re
+
+from randvar import RandomVariable, rand_apply
+from randvar.operations import _binomial_pmf, _binomial_tail, _convolve, \
+    _convolve_power, order_statistic, rand_max, rand_min
+
+
+class DiceSyntaxError(Exception):
+    pass
+
+
+_TOKEN = re.compile(r"\s*(?:(\d+)|([a-z]+)|(\S))")
+
+_KEEP_MODIFIERS = ("k", "kh", "kl", "dh", "dl")
+
+_FUNCTIONS = ("max", "min")
+
+
+def _tokenize(expression):
+    tokens = []
+    pos = 0
+    expression = expression.lower().rstrip()
+    while pos < len(expression):
+        match = _TOKEN.match(expression, pos)
+        number, word, symbol = match.groups()
+        if number is not None:
+            tokens.append(int(number))
+        elif word is not None:
+            tokens.append(word)
+        else:
+            tokens.append(symbol)
+        pos = match.end()
+    return tokens
+
+
+class _Const:
+    strategy = "constant"
+
+    def __init__(self, value):
+        self.value = value
+        self.children = ()
+
+    def evaluate(self):
+        return RandomVariable({self.value: 1})
+
+    def __str__(self):
+        return str(self.value)
+
+
+class _Pool:
+    """
+    A pool of `count` dice with `sides` sides, keeping the `keep` highest
+    (or lowest if `highest` is false) and summing them.
+    """
+
+    def __init__(self, count, sides, keep=None, highest=True):
+        self.count = count
+        self.sides = sides
+        self.keep = count if keep is None else min(keep, count)
+        self.highest = highest
+        self.children = ()
+        if self.keep == count:
+            self.strategy = "power"
+        elif self.keep == 1:
+            self.strategy = "order statistic"
+        else:
+            self.strategy = "keep"
+
+    def die(self):
+        return RandomVariable({face: 1 for face in range(1, self.sides + 1)})
+
+    def evaluate(self):
+        if self.strategy == "power":
+            return RandomVariable(_convolve_power(self.die()._dist,
+                                                  self.count))
+        if self.strategy == "order statistic":
+            k = 1 if self.highest else self.count
+            return order_statistic(self.die(), k, self.count)
+
+        dist = _keep_highest(self.count, self.sides, self.keep)
+        if not self.highest:
+            # The lowest dice are the highest of the dice flipped over
+            flip = self.keep * (self.sides + 1)
+            dist = {flip - val: prob for val, prob in dist.items()}
+        return RandomVariable(dist)
+
+    def __str__(self):
+        text = "%dd%d" % (self.count, self.sides)
+        if self.keep != self.count:
+            text += "%s%d" % ("kh" if self.highest else "kl", self.keep)
+        return text
+
+
+def _keep_highest(count, sides, keep):
+    """
+    Returns the distribution dictionary of the sum of the `keep` highest of
+    `count` dice with faces `1` to `sides`.
+    """
+
+    # Walk the faces from highest to lowest. Given that the dice not yet
+    # placed all show at most `face`, the number showing exactly `face` is
+    # binomial, and the first `keep` dice placed are the ones kept.
+    # `states[placed]` maps each kept sum to its probability, for fewer
+    # than `keep` dice placed.
+    states = {0: {0: 1}}
+    dist = {}
+
+    def add(dist, val, weight):
+        if val not in dist:
+            dist[val] = weight
+        else:
+            dist[val] += weight
+
+    for face in range(sides, 0, -1):
+        new_states = {}
+        for placed, totals in states.items():
+            remaining = count - placed
+            need = keep - placed
+            if face == 1:
+                for total, prob in totals.items():
+                    add(dist, total + need, prob)
+                continue
+
+            # The binomial terms depend only on the dice placed so far
+            pmf = [_binomial_pmf(remaining, shown, 1 / face)
+                   for shown in range(need)]
+            tail = _binomial_tail(remaining, need, 1 / face)
+            for total, prob in totals.items():
+                for shown, weight in enumerate(pmf):
+                    if shown + placed not in new_states:
+                        new_states[shown + placed] = {}
+                    add(new_states[shown + placed], total + shown * face,
+                        prob * weight)
+                add(dist, total + need * face, prob * tail)
+        states = new_states
+    return dist
+
+
+class _PoolExtreme:
+    """
+    The highest or lowest single die kept from a pool, as in
+    `max(4d6kh3)`.
+    """
+
+    strategy = "order statistic"
+
+    def __init__(self, pool, highest):
+        self.pool = pool
+        self.highest = highest
+        self.children = ()
+
+    def evaluate(self):
+        pool = self.pool
+        # Rank, counting from the highest, of the wanted die among all the
+        # dice rolled
+        if pool.highest:
+            k = 1 if self.highest else pool.keep
+        else:
+            k = pool.count - pool.keep + 1 if self.highest else pool.count
+        return order_statistic(pool.die(), k, pool.count)
+
+    def __str__(self):
+        return "%s(%s)" % ("max" if self.highest else "min", self.pool)
+
+
+class _Extreme:
+    strategy = "order statistic"
+
+    def __init__(self, children, highest):
+        self.children = tuple(children)
+        self.highest = highest
+
+    def evaluate(self):
+        func = rand_max if self.highest else rand_min
+        return func(*(child.evaluate() for child in self.children))
+
+    def __str__(self):
+        return "%s(%s)" % ("max" if self.highest else "min",
+                           ", ".join(str(child) for child in self.children))
+
+
+class _Sum:
+    strategy = "convolution"
+
+    def __init__(self, left, right, sign):
+        self.children = (left, right)
+        self.sign = sign
+
+    def evaluate(self):
+        left, right = (child.evaluate() for child in self.children)
+        scale = 1 / (left._weight_sum * right._weight_sum)
+        right_dist = {self.sign * val: weight
+                      for val, weight in right._dist.items()}
+        return RandomVariable({val: weight * scale for val, weight in
+                               _convolve(left._dist, right_dist).items()})
+
+    def __str__(self):
+        return "(%s %s %s)" % (self.children[0], "+" if self.sign > 0 else
+                               "-", self.children[1])
+
+
+class _Product:
+    def __init__(self, left, right):
+        self.children = (left, right)
+        if isinstance(left, _Const) or isinstance(right, _Const):
+            self.strategy = "scale"
+        else:
+            self.strategy = "generic"
+
+    def evaluate(self):
+        left, right = self.children
+        if self.strategy == "scale":
+            if isinstance(left, _Const):
+                left, right = right, left
+            var = left.evaluate()
+            dist = {}
+            for val, weight in var._dist.items():
+                val *= right.value
+                if val not in dist:
+                    dist[val] = weight
+                else:
+                    dist[val] += weight
+            return RandomVariable(dist)
+        return rand_apply(operator.mul, left.evaluate(), right.evaluate())
+
+    def __str__(self):
+        return "(%s * %s)" % self.children
+
+
+class DicePlan:
+    """
+    A compiled dice expression, which chooses how to compute each part of
+    the expression and caches the resulting random variable.
+    """
+
+    def __init__(self, expression):
+        """
+        Compiles the dice expression `expression`. See `expr` for the
+        syntax.
+        """
+
+        self.expression = expression
+        self._tokens = _tokenize(expression)
+        self._pos = 0
+        self.root = self._parse_sum()
+        if self._pos != len(self._tokens):
+            self._error("unexpected %r" % (self._tokens[self._pos],))
+        del self._tokens, self._pos
+        self._result = None
+
+    def evaluate(self):
+        """
+        Returns the random variable of the expression. The result is
+        computed once and shared by later calls, so it should not be
+        modified.
+        """
+
+        if self._result is None:
+            self._result = self.root.evaluate()
+        return self._result
+
+    def strategies(self):
+        """
+        Returns a list of `(text, strategy)` pairs describing how each part
+        of the expression is computed, outermost first, where `text` is the
+        part written as an expression.
+        """
+
+        pairs = []
+        stack = [self.root]
+        while len(stack) > 0:
+            node = stack.pop()
+            pairs.append((str(node), node.strategy))
+            stack.extend(reversed(node.children))
+        return pairs
+
+    def __str__(self):
+        return "DicePlan(%s)" % self.root
+
+    def __repr__(self):
+        return "DicePlan(%r)" % self.expression
+
+    # Recursive descent parser
+
+    def _error(self, message):
+        raise DiceSyntaxError("%s in dice expression %r" %
+                              (message, self.expression))
+
+    def _peek(self):
+        if self._pos < len(self._tokens):
+            return self._tokens[self._pos]
+        return None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            self._error("unexpected end")
+        self._pos += 1
+        return token
+
+    def _expect(self, token):
+        if self._next() != token:
+            self._error("expected %r" % (token,))
+
+    def _number(self):
+        token = self._next()
+        if not isinstance(token, int):
+            self._error("expected a number, got %r" % (token,))
+        return token
+
+    def _parse_sum(self):
+        node = self._parse_product()
+        while self._peek() in ("+", "-"):
+            sign = 1 if self._next() == "+" else -1
+            node = _Sum(node, self._parse_product(), sign)
+        return node
+
+    def _parse_product(self):
+        node = self._parse_unary()
+        while self._peek() == "*":
+            self._next()
+            node = _Product(node, self._parse_unary())
+        return node
+
+    def _parse_unary(self):
+        if self._peek() == "-":
+            self._next()
+            return _Product(_Const(-1), self._parse_unary())
+        return self._parse_atom()
+
+    def _parse_atom(self):
+        token = self._next()
+        if token == "(":
+            node = self._parse_sum()
+            self._expect(")")
+            return node
+        if token in _FUNCTIONS:
+            self._expect("(")
+            children = [self._parse_sum()]
+            while self._peek() == ",":
+                self._next()
+                children.append(self._parse_sum())
+            self._expect(")")
+            highest = token == "max"
+            if len(children) == 1 and isinstance(children[0], _Pool):
+                return _PoolExtreme(children[0], highest)
+            if len(children) == 1:
+                return children[0]
+            return _Extreme(children, highest)
+        if isinstance(token, int) and self._peek() != "d":
+            return _Const(token)
+        if isinstance(token, int):
+            count = token
+            token = self._next()
+        else:
+            count = 1
+        if token != "d":
+            self._error("unexpected %r" % (token,))
+        sides = self._number()
+        if sides < 1:
+            self._error("dice need at least one side")
+        pool = self._parse_keep(count, sides)
+        if pool.keep == 0:
+            # Nothing is kept, so the pool always sums to zero
+            return _Const(0)
+        return pool
+
+    def _parse_keep(self, count, sides):
+        modifier = self._peek()
+        if modifier not in _KEEP_MODIFIERS:
+            return _Pool(count, sides)
+        self._next()
+        amount = self._number() if isinstance(self._peek(), int) else 1
+        if modifier in ("k", "kh"):
+            return _Pool(count, sides, amount, highest=True)
+        if modifier == "kl":
+            return _Pool(count, sides, amount, highest=False)
+        # Dropping dice keeps the rest from the other end
+        keep = max(count - amount, 0)
+        return _Pool(count, sides, keep, highest=modifier == "dl")
+
+
+@functools.lru_cache(maxsize=256)
+def compile_expr(expression):
+    """
+    Returns the `DicePlan` of the dice expression `expression`. Plans are
+    cached by expression string.
+    """
+
+    return DicePlan(expression)
+
+
+def expr(expression):
+    """
+    Returns a random variable of the dice expression `expression`, such as
+    `"4d6kh3 + 1d8"` or `"max(2d20) - 2"`.
+
+    Expressions combine integers and dice with `+`, `-`, `*` and
+    parentheses. `NdM` rolls `N` dice with faces `1` to `M` and sums them
+    (`N` defaults to `1`). A pool can be followed by `khK` or `kK` to keep
+    the `K` highest dice, `klK` to keep the `K` lowest, or `dlK`/`dhK` to
+    drop the `K` lowest or highest (`K` defaults to `1`). `max(...)` and
+    `min(...)` take the highest or lowest of their arguments, or of the
+    dice in a single pool.
+
+    Sums are computed by convolution, pools by repeated squaring, order
+    statistics or a dynamic program over the faces, and other products with
+    `rand_apply`. Compiled expressions are cached (see `compile_expr`), so
+    the returned random variable is shared and should not be modified.
+    """
+
+    return compile_expr(expression).evaluate()
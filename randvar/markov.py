@@ -0,0 +1,169 @@
+from randvar import RandomVariable
+
+
+def _vec_mul(vec, rows):
+    """
+    Returns the product of the sparse row vector `vec` with the sparse
+    matrix `rows`, both keyed by state index.
+    """
+
+    out = {}
+    for i, p in vec.items():
+        for j, q in rows[i].items():
+            if j not in out:
+                out[j] = p * q
+            else:
+                out[j] += p * q
+    return out
+
+
+def _mat_mul(rows1, rows2):
+    """
+    Returns the product of the sparse matrices `rows1` and `rows2`.
+    """
+
+    return [_vec_mul(row, rows2) for row in rows1]
+
+
+class MarkovChain:
+    """
+    A Markov chain on a finite state space, defined by a step function
+    mapping each state to a random variable of the next state.
+    """
+
+    def __init__(self, step, states=()):
+        """
+        Creates a Markov chain whose transitions are given by `step`,
+        which should take a state and return a `RandomVariable` of the next
+        state (for example a `randomable` function). A non-random variable
+        return value is treated as a constant distribution.
+
+        The state space is `states` together with every state reachable from
+        them. The step function is called once for each state, and the
+        resulting transition matrix is cached.
+        """
+
+        self._step = step
+        self._states = []
+        self._index = {}
+        self._rows = []
+        # `self._powers[i]` caches the transition matrix to the power `2 ** i`
+        self._powers = []
+        self._add_states(states)
+
+    def _add_states(self, states):
+        """
+        Adds `states` and every state reachable from them to the chain.
+        """
+
+        queue = list(states)
+        while len(queue) > 0:
+            state = queue.pop()
+            if state not in self._index:
+                self._index[state] = len(self._states)
+                self._states.append(state)
+                self._rows.append(None)
+            elif self._rows[self._index[state]] is not None:
+                continue
+            self._powers = []
+
+            # Fill in the transition row, queueing any new states
+            var = self._step(state)
+            if not isinstance(var, RandomVariable):
+                var = RandomVariable({var: 1})
+            row = {}
+            for val, prob in var.dist():
+                if val not in self._index:
+                    self._index[val] = len(self._states)
+                    self._states.append(val)
+                    self._rows.append(None)
+                    queue.append(val)
+                row[self._index[val]] = prob
+            self._rows[self._index[state]] = row
+
+    def __len__(self):
+        """
+        Returns the number of states in the chain.
+        """
+
+        return len(self._states)
+
+    def states(self):
+        """
+        Returns a tuple of the states in the chain, in the order of the rows
+        and columns of `self.matrix()`.
+        """
+
+        return tuple(self._states)
+
+    def transition(self, state):
+        """
+        Returns a random variable of the state following `state`.
+        """
+
+        self._add_states((state,))
+        row = self._rows[self._index[state]]
+        return RandomVariable({self._states[j]: prob
+                               for j, prob in row.items()})
+
+    def matrix(self, dense=False):
+        """
+        Returns the transition matrix, indexed as `self.states()`. If
+        `dense` is true, this is a list of lists. Otherwise each row is a
+        dictionary from column indices to non-zero probabilities.
+        """
+
+        if dense:
+            return [[row.get(j, 0) for j in range(len(self._states))]
+                    for row in self._rows]
+        return [dict(row) for row in self._rows]
+
+    def _power(self, i):
+        """
+        Returns the transition matrix to the power `2 ** i`, computing it by
+        repeated squaring if it is not cached.
+        """
+
+        if len(self._powers) == 0:
+            self._powers.append(self._rows)
+        while len(self._powers) <= i:
+            last = self._powers[-1]
+            self._powers.append(_mat_mul(last, last))
+        return self._powers[i]
+
+    def propagate(self, var, n, tol=None):
+        """
+        Returns a random variable of the state after `n` steps of the chain,
+        starting from a state drawn from `var`. A non-random variable `var`
+        is treated as a constant distribution.
+
+        By default this uses cached powers of the transition matrix, so it
+        costs `O(log(n))` vector-matrix products. If `tol` is given, the
+        chain is instead stepped one at a time and stops early once the
+        total variation between consecutive steps is at most `tol`, so a
+        large `n` finds the stationary distribution.
+        """
+
+        if not isinstance(var, RandomVariable):
+            var = RandomVariable({var: 1})
+        self._add_states(var)
+        vec = {self._index[val]: prob for val, prob in var.dist()}
+
+        if tol is None:
+            i = 0
+            while n > 0:
+                if n & 1:
+                    vec = _vec_mul(vec, self._power(i))
+                n >>= 1
+                i += 1
+        else:
+            for _ in range(n):
+                new = _vec_mul(vec, self._rows)
+                diff = sum(abs(new.get(j, 0) - vec.get(j, 0))
+                           for j in set(new).union(vec)) / 2
+                vec = new
+                if diff <= tol:
+                    break
+
+        return RandomVariable({self._states[j]: prob
+                               for j, prob in vec.items()})
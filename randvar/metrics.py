@@ -0,0 +1,157 @@
+import itertools
+import math
+import numbers
+
+from randvar import RandomVariableBatch
+
+
+def _probabilities(var):
+    """
+    Returns a dictionary from the values of `var` to their probabilities.
+    """
+
+    return {val: weight / var._weight_sum for val, weight in var._dist.items()}
+
+
+def _batch_probabilities(batch):
+    """
+    Iterates over dictionaries from values to probabilities for each random
+    variable in the batch, without building the random variables.
+    """
+
+    for (start, stop), total in zip(batch._bounds(), batch._weight_sums):
+        yield {val: weight / total for val, weight in
+               zip(batch._values[start:stop], batch._weights[start:stop])}
+
+
+def _align(ref, other):
+    """
+    Aligns the probability dictionaries `ref` and `other` on the union of
+    their values, returning the list of values and the two lists of
+    probabilities. The values of `ref` come first, in its order.
+    """
+
+    values = list(ref)
+    values.extend(val for val in other if val not in ref)
+    p = [ref.get(val, 0) for val in values]
+    q = [other.get(val, 0) for val in values]
+    return values, p, q
+
+
+def _kl(p, q):
+    total = 0
+    for a, b in zip(p, q):
+        if a > 0:
+            if b == 0:
+                return float("inf")
+            total += a * math.log(a / b)
+    return total
+
+
+def _total_variation(p, q):
+    return sum(abs(a - b) for a, b in zip(p, q)) / 2
+
+
+def _js(p, q):
+    m = [(a + b) / 2 for a, b in zip(p, q)]
+    return (_kl(p, m) + _kl(q, m)) / 2
+
+
+def _hellinger(p, q):
+    return math.sqrt(sum((math.sqrt(a) - math.sqrt(b)) ** 2
+                         for a, b in zip(p, q)) / 2)
+
+
+def _wasserstein(values, p, q):
+    order = sorted(range(len(values)), key=values.__getitem__)
+    total = 0
+    diff = 0
+    for ind, nxt in zip(order, itertools.islice(order, 1, None)):
+        diff += p[ind] - q[ind]
+        total += abs(diff) * (values[nxt] - values[ind])
+    return total
+
+
+def total_variation(var1, var2):
+    """
+    Returns the total variation distance between the random variables
+    `var1` and `var2`.
+    """
+
+    return _total_variation(*_align(_probabilities(var1),
+                                     _probabilities(var2))[1:])
+
+
+def kl_divergence(var1, var2):
+    """
+    Returns the Kullback-Leibler divergence of `var2` from `var1`, in nats.
+    This is infinite if `var1` takes a value that `var2` cannot.
+    """
+
+    return _kl(*_align(_probabilities(var1), _probabilities(var2))[1:])
+
+
+def js_divergence(var1, var2):
+    """
+    Returns the Jensen-Shannon divergence between the random variables
+    `var1` and `var2`, in nats.
+    """
+
+    return _js(*_align(_probabilities(var1), _probabilities(var2))[1:])
+
+
+def hellinger(var1, var2):
+    """
+    Returns the Hellinger distance between the random variables `var1` and
+    `var2`.
+    """
+
+    return _hellinger(*_align(_probabilities(var1), _probabilities(var2))[1:])
+
+
+def wasserstein(var1, var2):
+    """
+    Returns the Wasserstein-1 (earth mover's) distance between the random
+    variables `var1` and `var2`, whose values must be real numbers.
+    """
+
+    return _wasserstein(*_align(_probabilities(var1), _probabilities(var2)))
+
+
+def _compare(ref, other):
+    values, p, q = _align(ref, other)
+    result = {"total_variation": _total_variation(p, q),
+              "kl_divergence": _kl(p, q),
+              "js_divergence": _js(p, q),
+              "hellinger": _hellinger(p, q),
+              "wasserstein": None}
+    if all(isinstance(val, numbers.Real) for val in values):
+        result["wasserstein"] = _wasserstein(values, p, q)
+    return result
+
+
+def compare(reference, other):
+    """
+    Returns a dictionary of every metric between the random variables
+    `reference` and `other`, keyed by the names of the metric functions in
+    this module. The supports are aligned once for all the metrics. The
+    `"wasserstein"` entry is `None` unless all the values are real numbers.
+    """
+
+    return _compare(_probabilities(reference), _probabilities(other))
+
+
+def compare_many(reference, candidates):
+    """
+    Returns a list of the dictionaries `compare(reference, candidate)` for
+    each random variable in `candidates`, which may be an iterable of random
+    variables or a `RandomVariableBatch`. The probabilities of `reference`
+    are computed only once.
+    """
+
+    ref = _probabilities(reference)
+    if isinstance(candidates, RandomVariableBatch):
+        others = _batch_probabilities(candidates)
+    else:
+        others = (_probabilities(var) for var in candidates)
+    return [_compare(ref, other) for other in others]
@@ -0,0 +1,226 @@
+import math
+
+from randvar import NegativeWeightError, RandomVariable
+
+
+def _as_variable(arg):
+    if isinstance(arg, RandomVariable):
+        return arg
+    return RandomVariable({arg: 1})
+
+
+def _cdf(var, values):
+    """
+    Returns the list of cumulative probabilities `P(var <= val)` for each
+    `val` in the sorted list `values`.
+    """
+
+    cum = []
+    total = 0
+    own = sorted(var._dist.items())
+    ind = 0
+    for val in values:
+        while ind < len(own) and own[ind][0] <= val:
+            total += own[ind][1]
+            ind += 1
+        cum.append(total / var._weight_sum)
+    return cum
+
+
+def _from_cdf(values, cum):
+    """
+    Builds a random variable on the sorted list `values` from the list of
+    cumulative probabilities `cum`.
+    """
+
+    dist = {}
+    prev = 0
+    for val, c in zip(values, cum):
+        # Rounding can leave tiny negative differences behind
+        weight = max(c - prev, 0)
+        if weight > 0:
+            dist[val] = weight
+        prev = c
+    return RandomVariable(dist)
+
+
+def _binomial_pmf(n, i, c):
+    """
+    Returns the probability that exactly `i` of `n` independent trials
+    succeed, where each succeeds with probability `0 < c < 1`.
+    """
+
+    # Work in log space, since the binomial coefficients overflow floats
+    # long before the probabilities do
+    return math.exp(math.lgamma(n + 1) - math.lgamma(i + 1) -
+                    math.lgamma(n - i + 1) + i * math.log(c) +
+                    (n - i) * math.log1p(-c))
+
+
+def _binomial_tail(n, m, c):
+    """
+    Returns the probability that at least `m` of `n` independent trials
+    succeed, where each succeeds with probability `c`.
+    """
+
+    if c <= 0:
+        return 0
+    if c >= 1:
+        return 1
+
+    # Sum the tail away from the mode, so that rounding stays relative to
+    # the smaller of the two tails
+    if m > n * c:
+        return sum(_binomial_pmf(n, i, c) for i in range(m, n + 1))
+    return 1 - sum(_binomial_pmf(n, i, c) for i in range(m))
+
+
+def order_statistic(var, k, n):
+    """
+    Returns a random variable representing the `k`th highest of `n`
+    independent draws from the random variable `var`, so `k=1` gives the
+    maximum and `k=n` gives the minimum. The values of `var` must be
+    mutually comparable.
+
+    Computed from the cumulative distribution of `var` as a binomial tail
+    sum, without enumerating the `len(var) ** n` joint outcomes.
+    """
+
+    if not 1 <= k <= n:
+        raise ValueError("need 1 <= k <= n, got k=%r, n=%r" % (k, n))
+    var = _as_variable(var)
+    values = sorted(var)
+
+    # The `k`th highest is at most `val` exactly when at least `n - k + 1`
+    # of the draws are at most `val`
+    cum = []
+    for c in _cdf(var, values):
+        cum.append(_binomial_tail(n, n - k + 1, c))
+    return _from_cdf(values, cum)
+
+
+def rand_max(*args):
+    """
+    Returns a random variable representing the maximum of the independent
+    random variables `args`. Non-random variable arguments are treated as
+    constant distributions.
+
+    Computed as the product of the cumulative distributions of `args`.
+    """
+
+    rand_args = [_as_variable(arg) for arg in args]
+    values = sorted(set().union(*rand_args))
+    cum = [1] * len(values)
+    for var in rand_args:
+        cum = [c * f for c, f in zip(cum, _cdf(var, values))]
+    return _from_cdf(values, cum)
+
+
+def rand_min(*args):
+    """
+    Returns a random variable representing the minimum of the independent
+    random variables `args`. Non-random variable arguments are treated as
+    constant distributions.
+
+    Computed as the product of the survival functions of `args`.
+    """
+
+    rand_args = [_as_variable(arg) for arg in args]
+    values = sorted(set().union(*rand_args))
+    surv = [1] * len(values)
+    for var in rand_args:
+        surv = [s * (1 - f) for s, f in zip(surv, _cdf(var, values))]
+    return _from_cdf(values, [1 - s for s in surv])
+
+
+def _convolve(dist1, dist2):
+    """
+    Returns the distribution dictionary of the sum of two independent
+    variables with distribution dictionaries `dist1` and `dist2`.
+    """
+
+    dist = {}
+    for val1, weight1 in dist1.items():
+        for val2, weight2 in dist2.items():
+            val = val1 + val2
+            if val not in dist:
+                dist[val] = weight1 * weight2
+            else:
+                dist[val] += weight1 * weight2
+    return dist
+
+
+def _convolve_power(dist, n):
+    """
+    Returns the distribution dictionary of the sum of `n` independent
+    variables with distribution dictionary `dist`, by repeated squaring.
+    """
+
+    result = {0: 1}
+    while n > 0:
+        if n & 1:
+            result = _convolve(result, dist)
+        n >>= 1
+        if n > 0:
+            dist = _convolve(dist, dist)
+    return result
+
+
+def mixture(components):
+    """
+    Returns a random variable that is drawn from the component random
+    variable `var` with probability proportional to `weight` for each
+    `(var, weight)` pair in `components`. Non-random variable components are
+    treated as constant distributions.
+    """
+
+    dist = {}
+    for var, weight in components:
+        if weight < 0:
+            raise NegativeWeightError(weight)
+        if weight == 0:
+            continue
+        var = _as_variable(var)
+        scale = weight / var._weight_sum
+        for val, var_weight in var._dist.items():
+            if val not in dist:
+                dist[val] = scale * var_weight
+            else:
+                dist[val] += scale * var_weight
+    return RandomVariable(dist)
+
+
+def compound_sum(count_var, term_var):
+    """
+    Returns a random variable representing the sum of `count` independent
+    draws from `term_var`, where `count` is itself drawn from `count_var`.
+    The values of `count_var` must be non-negative integers, and an empty
+    sum is `0`.
+
+    The partial sums are built incrementally, so each additional term costs
+    a single convolution.
+    """
+
+    count_var = _as_variable(count_var)
+    term_var = _as_variable(term_var)
+    for count in count_var:
+        if not isinstance(count, int) or count < 0:
+            raise ValueError("counts must be non-negative integers, got %r" %
+                             (count,))
+
+    term = {val: weight / term_var._weight_sum
+            for val, weight in term_var._dist.items()}
+    partial = {0: 1}
+    dist = {}
+    for count in range(max(count_var) + 1):
+        if count > 0:
+            partial = _convolve(partial, term)
+        prob = count_var[count]
+        if prob == 0:
+            continue
+        for val, weight in partial.items():
+            if val not in dist:
+                dist[val] = prob * weight
+            else:
+                dist[val] += prob * weight
+    return RandomVariable(dist)
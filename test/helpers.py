@@ -0,0 +1,18 @@
+from math import isclose
+
+
+class DistributionAssertions:
+    """
+    Assertions for comparing random variables, mixed into test cases.
+    """
+
+    def assertSameDistribution(self, var1, var2):
+        """
+        Asserts that the random variables `var1` and `var2` take the same
+        values with the same probabilities, up to rounding.
+        """
+
+        self.assertEqual(set(var1), set(var2))
+        for val in var1:
+            self.assertTrue(isclose(var1[val], var2[val], rel_tol=1e-09,
+                                    abs_tol=1e-12))
@@ -0,0 +1,149 @@
+from math import isclose
+import unittest
+
+from randvar import EmptyDistributionError, ZeroDistributionError, \
+    NegativeWeightError, RandomVariable, RandomVariableBatch, uniform, mean, \
+    expected_value, percentile, median, mode, variance, stddev
+
+
+class TestRandomVariableBatch(unittest.TestCase):
+    """
+    Tests the `RandomVariableBatch` class against the single-variable
+    statistics functions.
+    """
+
+    def setUp(self):
+        self.variables = [uniform(range(1, 7)),
+                          RandomVariable({3: 1}),
+                          RandomVariable({2.5: 3, 1: 1, 10: 2, 4: 1}),
+                          RandomVariable({5: 1, 1: 2, 3: 4, 2: 3})]
+        self.batch = RandomVariableBatch(self.variables)
+
+    def assertAllClose(self, got, expected):
+        self.assertEqual(len(got), len(expected))
+        for a, b in zip(got, expected):
+            self.assertTrue(isclose(a, b, rel_tol=1e-09, abs_tol=1e-12))
+
+    def test_pack(self):
+        """
+        Tests packing random variables into a batch and unpacking them again.
+        """
+
+        self.assertEqual(len(self.batch), 4)
+        for var, unpacked in zip(self.variables, self.batch):
+            self.assertEqual(set(var), set(unpacked))
+            for val in var:
+                self.assertTrue(isclose(var[val], unpacked[val]))
+
+        batch = RandomVariableBatch.from_arrays([2, 1, 7], [1, 1, 2],
+                                                [0, 2, 3])
+        self.assertEqual(batch.expected_value(), [1.5, 7])
+
+        # Zero weights are removed and repeated values merged
+        batch = RandomVariableBatch.from_arrays([1, 2, 3, 1, 3, 1],
+                                                [0, 1, 1, 1, 2, 2],
+                                                [0, 3, 6])
+        self.assertEqual(batch.mean(float("-inf")), [2, 1])
+        self.assertEqual(batch.mean(float("inf")), [3, 3])
+        self.assertEqual(batch.mode(2), [3, 3])
+        self.assertEqual(dict(batch[1].dist()), {1: 3 / 5, 3: 2 / 5})
+        self.assertEqual(len(batch[0]), 2)
+        with self.assertRaises(ZeroDistributionError):
+            RandomVariableBatch.from_arrays([1, 2], [0, 0], [0, 2])
+        with self.assertRaises(EmptyDistributionError):
+            RandomVariableBatch.from_arrays([1, 2], [1, 1], [0, 0, 2])
+        with self.assertRaises(NegativeWeightError):
+            RandomVariableBatch.from_arrays([1, 2], [1, -1], [0, 2])
+        with self.assertRaises(ValueError):
+            RandomVariableBatch.from_arrays([1, 2], [1, 1], [0, 1])
+
+    def test_statistics(self):
+        """
+        Tests every batch statistic against the matching function in
+        `randvar.statistics`.
+        """
+
+        for p in (float("-inf"), -1, 0, 1, 2, float("inf")):
+            self.assertAllClose(self.batch.mean(p),
+                                [mean(var, p) for var in self.variables])
+        self.assertAllClose(self.batch.expected_value(),
+                            [expected_value(var) for var in self.variables])
+        for p in (0, 0.1, 0.25, 0.5, 0.9, 0.99):
+            self.assertEqual(self.batch.percentile(p),
+                             [percentile(var, p) for var in self.variables])
+        self.assertEqual(self.batch.percentile(1), [6, 3, 10, 5])
+        self.assertEqual(self.batch.median(),
+                         [median(var) for var in self.variables])
+        self.assertEqual(self.batch.mode(),
+                         [mode(var) for var in self.variables])
+        self.assertEqual(RandomVariableBatch(self.variables[2:]).mode(2),
+                         [mode(var, 2) for var in self.variables[2:]])
+        self.assertAllClose(self.batch.variance(),
+                            [variance(var) for var in self.variables])
+        self.assertAllClose(self.batch.stddev(),
+                            [stddev(var) for var in self.variables])
+
+    def test_exact_values(self):
+        """
+        Tests that values come back from the batch exactly as they went in,
+        keeping ints as ints even beyond the precision of floats.
+        """
+
+        big = 2 ** 60 + 1
+        variables = [RandomVariable({big: 1}),
+                     RandomVariable({4: 3, 1: 1, 2.5: 1})]
+        for batch in (RandomVariableBatch(variables),
+                      RandomVariableBatch.from_arrays([big, 4, 1, 2.5],
+                                                      [1, 3, 1, 1],
+                                                      [0, 1, 4])):
+            for results in (batch.mode(), batch.median(),
+                            batch.percentile(0.9), batch.mean(float("inf")),
+                            batch.mean(float("-inf")),
+                            [sample[0] for sample in batch.sample()]):
+                self.assertEqual(type(results[0]), int)
+                self.assertEqual(results[0], big)
+            self.assertEqual(batch.mode()[1], 4)
+            self.assertEqual(type(batch.mode()[1]), int)
+            self.assertEqual(batch.mean(float("-inf"))[1], 1)
+            self.assertEqual(type(batch.mean(float("-inf"))[1]), int)
+            self.assertEqual(list(batch[0]), [big])
+            self.assertEqual([type(val) for val in batch[1]],
+                             [int, int, float])
+
+    def test_mode_ties(self):
+        """
+        Tests that `RandomVariableBatch.mode` breaks ties between equally
+        probable values the same way as `mode`, for packed random variables,
+        for batches built from arrays and after unpacking.
+        """
+
+        variables = [RandomVariable({5: 1, 2: 1}),
+                     RandomVariable({1: 2, 9: 1, 4: 2, 0: 1})]
+        batch = RandomVariableBatch(variables)
+        for k in (1, 2):
+            self.assertEqual(batch.mode(k), [mode(var, k) for var in variables])
+            self.assertEqual([mode(var, k) for var in batch],
+                             [mode(var, k) for var in variables])
+        batch = RandomVariableBatch.from_arrays([5, 2, 1, 9, 4, 0],
+                                                [1, 1, 2, 1, 2, 1],
+                                                [0, 2, 6])
+        self.assertEqual(batch.mode(), [5, 1])
+        self.assertEqual(batch.mode(2), [2, 4])
+
+    def test_sample(self):
+        """
+        Tests `RandomVariableBatch.sample`, checking that the values come
+        from each distribution in roughly the right proportions.
+        """
+
+        samples = self.batch.sample(1000)
+        self.assertEqual(len(samples), 4)
+        for var, sample in zip(self.variables, samples):
+            self.assertEqual(len(sample), 1000)
+            self.assertTrue(set(sample) <= set(var))
+        self.assertEqual(set(samples[1]), {3})
+        self.assertLess(abs(samples[2].count(2.5) - 1000 * 3 / 7), 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,12 @@
 from math import factorial, isclose
 from random import randint
+import asyncio
 import itertools
 import unittest
 
 from randvar import EmptyDistributionError, ZeroDistributionError, \
-    NegativeWeightError, RandomVariable, rand_apply, randomable
+    NegativeWeightError, RandomVariable, rand_apply, rand_apply_many, \
+    randomable, get_copy_policy, set_copy_policy, SampledRandomVariable
 
 
 class TestRandomVariableMethods(unittest.TestCase):
@@ -137,6 +139,96 @@ class TestRandomVariableMethods(unittest.TestCase):
         self.assertLess(abs(counts[1] - 500), 53)  # p < 0.001
         self.assertLess(abs(counts[2] - 250), 46)  # p < 0.001
 
+    def test_iter_samples(self):
+        """
+        Tests `RandomVariable.iter_samples` and 
+        `RandomVariable.aiter_samples`, checking that the sample 
+        distribution roughly matches the variable distribution across
+        several buffer refills.
+        """
+
+        myvar = RandomVariable({0: 0.25, 1: 0.5, 2: 0.25, 3: 0})
+        counts = [0, 0, 0, 0]
+        for i in itertools.islice(myvar.iter_samples(batch_size=7), 1000):
+            counts[i] += 1
+        self.assertLess(abs(counts[0] - 250), 46)  # p < 0.001
+        self.assertLess(abs(counts[1] - 500), 53)  # p < 0.001
+        self.assertLess(abs(counts[2] - 250), 46)  # p < 0.001
+        self.assertEqual(counts[3], 0)
+
+        async def collect():
+            vals = []
+            async for val in myvar.aiter_samples(batch_size=64):
+                vals.append(val)
+                if len(vals) == 1000:
+                    return vals
+
+        loop = asyncio.new_event_loop()
+        try:
+            vals = loop.run_until_complete(collect())
+        finally:
+            loop.close()
+        counts = [0, 0, 0, 0]
+        for i in vals:
+            counts[i] += 1
+        self.assertLess(abs(counts[0] - 250), 46)  # p < 0.001
+        self.assertLess(abs(counts[1] - 500), 53)  # p < 0.001
+        self.assertLess(abs(counts[2] - 250), 46)  # p < 0.001
+        self.assertEqual(counts[3], 0)
+
+        # Bad arguments are rejected by the call itself
+        with self.assertRaises(ValueError):
+            myvar.iter_samples(batch_size=0)
+        with self.assertRaises(ValueError):
+            myvar.iter_samples(copy="bogus")
+        with self.assertRaises(ValueError):
+            myvar.aiter_samples(batch_size=0)
+        with self.assertRaises(ValueError):
+            myvar.aiter_samples(copy="bogus")
+
+    def test_copy_policy(self):
+        """
+        Tests that `RandomVariable.choice` and `rand_apply` copy mutable
+        values according to the per-call, per-variable and global copy
+        policies, and hand out immutable values without copying by default.
+        """
+
+        class Box:
+            def __init__(self):
+                self.items = [[]]
+
+        box = Box()
+        boxvar = RandomVariable({box: 1})
+        self.assertEqual(get_copy_policy(), "auto")
+        self.assertIsNot(boxvar.choice(), box)
+        self.assertIs(boxvar.choice(copy="none"), box)
+        shallow = boxvar.choice(copy="shallow")
+        self.assertIsNot(shallow, box)
+        self.assertIs(shallow.items, box.items)
+        self.assertIsNot(boxvar.choice(copy="deep").items, box.items)
+        self.assertIs(RandomVariable({box: 1}, copy="none").choice(), box)
+
+        tuplevar = RandomVariable({(1, ("a", None)): 1, 2.5: 1})
+        self.assertIs(tuplevar._copier(), tuplevar._copier("none"))
+
+        self.assertIs(rand_apply(lambda x: x, boxvar, copy="none").choice(
+            copy="none"), box)
+        self.assertIsNot(rand_apply(lambda x: x, boxvar).choice(copy="none"),
+                         box)
+
+        set_copy_policy("none")
+        try:
+            self.assertIs(boxvar.choice(), box)
+            self.assertIsNot(boxvar.choice(copy="deep"), box)
+            self.assertIs(rand_apply(lambda x: x, x=boxvar).choice(), box)
+        finally:
+            set_copy_policy("auto")
+
+        with self.assertRaises(ValueError):
+            RandomVariable({0: 1}, copy="sometimes")
+        with self.assertRaises(ValueError):
+            set_copy_policy("sometimes")
+
 
 def binom(n, k):
     return factorial(n) / (factorial(k) * factorial(n - k))
@@ -144,7 +236,7 @@ def binom(n, k):
 
 class TestRandomWrappers(unittest.TestCase):
     """
-    Tests the functions `rand_apply` and `randomable`
+    Tests the functions `rand_apply`, `rand_apply_many` and `randomable`
     """
 
     def test_rand_apply(self):
@@ -220,6 +312,127 @@ class TestRandomWrappers(unittest.TestCase):
         self.assertTrue(isclose(detvar[1], 3 / 16, rel_tol=1e-05, abs_tol=1.0))
         self.assertTrue(isclose(detvar[2], 1 / 64, rel_tol=1e-05, abs_tol=1.0))
 
+    def test_rand_apply_many(self):
+        """
+        Tests `rand_apply_many` by comparing each output against separate
+        `rand_apply` calls, and the joint output against a `rand_apply` that
+        returns tuples.
+        """
+
+        var1 = RandomVariable({0: 1, 1: 2, 2: 1})
+        var2 = RandomVariable({-1: 3, 1: 1})
+
+        def total(a, b, c):
+            return a + b + c
+
+        def largest(a, b, c):
+            return max(a, b, c)
+
+        def flag(a, b, c):
+            return a + b + c > 1
+
+        funcs = [total, largest, flag]
+        outputs = rand_apply_many(funcs, var1, var2, c=var1)
+        self.assertEqual(len(outputs), 3)
+        for func, outvar in zip(funcs, outputs):
+            expected = rand_apply(func, var1, var2, c=var1)
+            self.assertEqual(set(outvar), set(expected))
+            for val in outvar:
+                self.assertTrue(isclose(outvar[val], expected[val],
+                                        rel_tol=1e-09))
+
+        outputs, jointvar = rand_apply_many(funcs, var1, var2, c=var1,
+                                            joint=True)
+        expected = rand_apply(lambda *args: tuple(f(*args) for f in funcs),
+                              var1, var2, var1)
+        self.assertEqual(set(jointvar), set(expected))
+        for val in jointvar:
+            self.assertTrue(isclose(jointvar[val], expected[val],
+                                    rel_tol=1e-09))
+
+    def test_rand_apply_montecarlo(self):
+        """
+        Tests `rand_apply` with `method="montecarlo"` and `method="auto"` by
+        estimating the distribution of a sum of dice, checking that the
+        confidence bounds contain the known values and that seeded runs are
+        reproducible.
+        """
+
+        die = RandomVariable({k: 1 for k in range(1, 7)})
+
+        def mysum(*args, bonus=0):
+            return sum(args) + bonus
+
+        exact = rand_apply(mysum, die, die, die, bonus=1)
+        estimate = rand_apply(mysum, die, die, die, bonus=1,
+                              method="montecarlo", samples=20000, seed=1)
+        self.assertIsInstance(estimate, SampledRandomVariable)
+        self.assertEqual(estimate.samples, 20000)
+        self.assertTrue(set(estimate) <= set(exact))
+        for val in (4, 8, 11, 19):
+            lower, upper = estimate.probability_bounds(val, level=0.999)
+            self.assertLessEqual(lower, exact[val])
+            self.assertGreaterEqual(upper, exact[val])
+        lower, upper = estimate.expected_value_bounds(level=0.999)
+        self.assertLess(lower, 11.5)
+        self.assertGreater(upper, 11.5)
+        self.assertLess(upper - lower, 0.2)
+        lower, upper = estimate.variance_bounds(level=0.999)
+        self.assertLess(lower, 35 / 4)
+        self.assertGreater(upper, 35 / 4)
+        self.assertLess(upper - lower, 1)
+        lower, upper = estimate.moment_bounds(2, level=0.999)
+        self.assertLess(lower, 141)
+        self.assertGreater(upper, 141)
+        self.assertEqual(estimate.moment_bounds(1),
+                         estimate.expected_value_bounds())
+
+        again = rand_apply(mysum, die, die, die, bonus=1,
+                           method="montecarlo", samples=20000, seed=1)
+        self.assertEqual(estimate._dist, again._dist)
+
+        auto = rand_apply(mysum, die, die, die, method="auto", budget=216)
+        self.assertNotIsInstance(auto, SampledRandomVariable)
+        auto = rand_apply(mysum, die, die, die, method="auto", budget=215,
+                          samples=100)
+        self.assertIsInstance(auto, SampledRandomVariable)
+        self.assertEqual(auto.samples, 100)
+
+        with self.assertRaises(ValueError):
+            rand_apply(mysum, die, method="guess")
+        with self.assertRaises(ValueError):
+            rand_apply(mysum, die, method="montecarlo", samples=0)
+
+    def test_randomable_copy_keyword(self):
+        """
+        Tests that `randomable` passes a keyword argument named `copy` on to
+        the wrapped function rather than treating it as a copy policy.
+        """
+
+        @randomable
+        def shift(x, copy):
+            return x + copy
+
+        shifted = shift(RandomVariable({1: 1, 2: 1}), copy=5)
+        self.assertEqual(set(shifted), {6, 7})
+        shifted = shift(1, copy=RandomVariable({0: 1, 10: 3}))
+        self.assertEqual(shifted[11], 3 / 4)
+
+    def test_randomable_option_keywords(self):
+        """
+        Tests that `randomable` passes keyword arguments named like the
+        options of `rand_apply` on to the wrapped function.
+        """
+
+        @randomable
+        def shift(x, seed=0, samples=0, method=0, budget=0):
+            return x + seed + samples + method + budget
+
+        myvar = RandomVariable({1: 1, 2: 1})
+        self.assertEqual(set(shift(myvar, seed=10)), {11, 12})
+        self.assertEqual(set(shift(myvar, samples=1, method=2, budget=3)),
+                         {7, 8})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+
+from randvar import RandomVariable, rand_apply, uniform, DiceSyntaxError, \
+    compile_expr, expr
+
+from helpers import DistributionAssertions
+
+
+def die(sides):
+    return uniform(range(1, sides + 1))
+
+
+class TestDiceExpressions(DistributionAssertions, unittest.TestCase):
+    """
+    Tests dice expressions against brute force `rand_apply` enumeration.
+    """
+
+    def test_sums(self):
+        """
+        Tests sums, differences and products of dice and constants.
+        """
+
+        self.assertSameDistribution(
+            expr("3d6+2"),
+            rand_apply(lambda a, b, c: a + b + c + 2, die(6), die(6), die(6)))
+        self.assertSameDistribution(
+            expr("2 * d4 - (1d3 * 1d2)"),
+            rand_apply(lambda a, b, c: 2 * a - b * c, die(4), die(3), die(2)))
+        self.assertSameDistribution(expr("-d4"),
+                                    uniform(range(-4, 0)))
+        self.assertSameDistribution(expr("7"), RandomVariable({7: 1}))
+
+    def test_keep(self):
+        """
+        Tests keeping and dropping dice from a pool.
+        """
+
+        def keep_highest(*rolls):
+            return sum(sorted(rolls)[1:])
+
+        brute = rand_apply(keep_highest, *((die(6),) * 4))
+        self.assertSameDistribution(expr("4d6kh3"), brute)
+        self.assertSameDistribution(expr("4D6 dl"), brute)
+        self.assertSameDistribution(
+            expr("3d8kl2"),
+            rand_apply(lambda *rolls: sum(sorted(rolls)[:2]),
+                       *((die(8),) * 3)))
+        self.assertSameDistribution(
+            expr("3d6dh2"), rand_apply(min, *((die(6),) * 3)))
+        self.assertSameDistribution(
+            expr("2d20k1"), rand_apply(max, die(20), die(20)))
+
+        # Large pools, against folding in one die at a time while tracking
+        # only the dice kept so far
+        for expression, count, sides, keep in (
+                ("20d10kh3", 20, 10, lambda top: top[-3:]),
+                ("15d8kl4", 15, 8, lambda top: top[:4])):
+            state = RandomVariable({(): 1})
+            for _ in range(count):
+                state = rand_apply(
+                    lambda top, roll: tuple(keep(sorted(top + (roll,)))),
+                    state, die(sides))
+            self.assertSameDistribution(expr(expression),
+                                        rand_apply(sum, state))
+
+    def test_extremes(self):
+        """
+        Tests `max` and `min` over a pool and over several arguments.
+        """
+
+        self.assertSameDistribution(expr("max(2d20)"),
+                                    rand_apply(max, die(20), die(20)))
+        self.assertSameDistribution(
+            expr("min(4d6kh3)"),
+            rand_apply(lambda *rolls: sorted(rolls)[1], *((die(6),) * 4)))
+        self.assertSameDistribution(
+            expr("max(4d6kl2)"),
+            rand_apply(lambda *rolls: sorted(rolls)[1], *((die(6),) * 4)))
+        self.assertSameDistribution(
+            expr("min(1d6, 1d8 + 1, 4)"),
+            rand_apply(lambda a, b: min(a, b + 1, 4), die(6), die(8)))
+
+        # Pools that keep no dice are constant zero
+        for empty in ("max(4d6kh0)", "min(4d6kh0)", "max(0d6)", "min(3d6dl5)"):
+            self.assertSameDistribution(expr(empty), RandomVariable({0: 1}))
+
+    def test_plan(self):
+        """
+        Tests that compiled plans are cached and choose the expected
+        strategies, and that malformed expressions are rejected.
+        """
+
+        plan = compile_expr("4d6kh3 + 10d6 + max(2d20)")
+        self.assertIs(compile_expr("4d6kh3 + 10d6 + max(2d20)"), plan)
+        self.assertIs(plan.evaluate(), plan.evaluate())
+        self.assertEqual(dict(plan.strategies()),
+                         {"((4d6kh3 + 10d6) + max(2d20))": "convolution",
+                          "(4d6kh3 + 10d6)": "convolution",
+                          "4d6kh3": "keep",
+                          "10d6": "power",
+                          "max(2d20)": "order statistic"})
+        self.assertEqual(compile_expr("max(4d6kl0) + 0d8").strategies(),
+                         [("(0 + 0)", "convolution"), ("0", "constant"),
+                          ("0", "constant")])
+
+        for bad in ("", "3d", "d6 +", "max(1d6", "2 3", "4d6kh3 $", "foo"):
+            with self.assertRaises(DiceSyntaxError):
+                compile_expr(bad)
+
+
+if __name__ == "__main__":
+    unittest.main()
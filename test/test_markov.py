@@ -0,0 +1,78 @@
+from math import isclose
+import unittest
+
+from randvar import RandomVariable, randomable, MarkovChain
+
+from helpers import DistributionAssertions
+
+
+def walk(state):
+    """
+    A lazy random walk on `range(5)` that stays put at the ends half the
+    time.
+    """
+
+    return RandomVariable({max(state - 1, 0): 1, min(state + 1, 4): 1})
+
+
+class TestMarkovChain(DistributionAssertions, unittest.TestCase):
+    """
+    Tests the `MarkovChain` class
+    """
+
+    def test_states(self):
+        """
+        Tests that the state space is closed under the step function and
+        that the transition matrix rows sum to 1.
+        """
+
+        chain = MarkovChain(walk, [2])
+        self.assertEqual(set(chain.states()), set(range(5)))
+        self.assertEqual(len(chain), 5)
+        for row in chain.matrix(dense=True):
+            self.assertEqual(len(row), 5)
+            self.assertTrue(isclose(sum(row), 1))
+        self.assertSameDistribution(chain.transition(0),
+                                    RandomVariable({0: 1, 1: 1}))
+
+    def test_propagate(self):
+        """
+        Tests `MarkovChain.propagate` against repeatedly applying a
+        `randomable` step function.
+        """
+
+        @randomable
+        def step(state):
+            return state + 1 if state < 3 else 0
+
+        @randomable
+        def coin_step(state, coin):
+            return (state + coin) % 4
+
+        coin = RandomVariable({0: 1, 1: 3})
+        var = RandomVariable({0: 1, 2: 1})
+        chain = MarkovChain(lambda state: coin_step(state, coin))
+        expected = var
+        for n in range(12):
+            self.assertSameDistribution(chain.propagate(var, n), expected)
+            expected = coin_step(expected, coin)
+
+        # A deterministic cycle
+        chain = MarkovChain(step, [0])
+        self.assertSameDistribution(chain.propagate(1, 1001),
+                                    RandomVariable({2: 1}))
+
+    def test_stationary(self):
+        """
+        Tests that `MarkovChain.propagate` with a tolerance stops at the
+        stationary distribution of a lazy random walk.
+        """
+
+        chain = MarkovChain(walk)
+        stationary = chain.propagate(0, 10 ** 6, tol=1e-14)
+        for state in range(5):
+            self.assertTrue(isclose(stationary[state], 1 / 5, rel_tol=1e-09))
+
+
+if __name__ == "__main__":
+    unittest.main()
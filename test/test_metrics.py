@@ -0,0 +1,70 @@
+from math import isclose, log, sqrt
+import unittest
+
+from randvar import RandomVariable, RandomVariableBatch, uniform, \
+    total_variation, kl_divergence, js_divergence, hellinger, wasserstein, \
+    compare, compare_many
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Tests divergence and distance metrics between random variables.
+    """
+
+    def setUp(self):
+        self.var1 = RandomVariable({0: 1, 1: 1})
+        self.var2 = RandomVariable({1: 1, 2: 3})
+        self.var3 = RandomVariable({0: 1, 1: 3})
+
+    def test_metrics(self):
+        """
+        Tests each metric against values worked out by hand.
+        """
+
+        self.assertTrue(isclose(total_variation(self.var1, self.var2), 3 / 4))
+        self.assertTrue(isclose(total_variation(self.var1, self.var1), 0,
+                                abs_tol=1e-12))
+        self.assertEqual(kl_divergence(self.var1, self.var2), float("inf"))
+        self.assertTrue(isclose(kl_divergence(self.var1, self.var3),
+                                (log(2) + log(2 / 3)) / 2, rel_tol=1e-09))
+        self.assertTrue(isclose(js_divergence(self.var1, self.var2),
+                                js_divergence(self.var2, self.var1)))
+        self.assertLessEqual(js_divergence(self.var1, self.var2), log(2))
+        self.assertTrue(isclose(
+            hellinger(self.var1, self.var3),
+            sqrt(((sqrt(1 / 2) - sqrt(1 / 4)) ** 2 +
+                  (sqrt(1 / 2) - sqrt(3 / 4)) ** 2) / 2)))
+        self.assertTrue(isclose(wasserstein(self.var1, self.var2), 5 / 4))
+        self.assertTrue(isclose(wasserstein(uniform(range(5)),
+                                            uniform(range(3, 8))), 3))
+
+    def test_compare(self):
+        """
+        Tests that `compare` and `compare_many` agree with the individual
+        metric functions, for lists of random variables and for batches.
+        """
+
+        candidates = [self.var1, self.var2, self.var3]
+        expected = [{"total_variation": total_variation(self.var1, var),
+                     "kl_divergence": kl_divergence(self.var1, var),
+                     "js_divergence": js_divergence(self.var1, var),
+                     "hellinger": hellinger(self.var1, var),
+                     "wasserstein": wasserstein(self.var1, var)}
+                    for var in candidates]
+        self.assertEqual(compare(self.var1, self.var2), expected[1])
+        for results in (compare_many(self.var1, candidates),
+                        compare_many(self.var1,
+                                     RandomVariableBatch(candidates))):
+            self.assertEqual(len(results), 3)
+            for result, known in zip(results, expected):
+                self.assertEqual(set(result), set(known))
+                for name in known:
+                    self.assertTrue(isclose(result[name], known[name],
+                                            abs_tol=1e-12))
+
+        self.assertIsNone(compare(RandomVariable({"a": 1}),
+                                  RandomVariable({"b": 1}))["wasserstein"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+from fractions import Fraction
+from math import factorial, isclose
+import unittest
+
+from randvar import NegativeWeightError, RandomVariable, rand_apply, \
+    uniform, const, poisson_trunc, order_statistic, rand_max, rand_min, \
+    mixture, compound_sum
+
+from helpers import DistributionAssertions
+
+
+class TestOrderStatistics(DistributionAssertions, unittest.TestCase):
+    """
+    Tests the functions `order_statistic`, `rand_max` and `rand_min`
+    """
+
+    def test_order_statistic(self):
+        """
+        Tests `order_statistic` by comparing every `k`th highest of four
+        draws of a skewed die against brute force enumeration.
+        """
+
+        die = RandomVariable({1: 1, 2: 2, 3: 3, 4: 1, 6: 5})
+        n = 4
+        for k in range(1, n + 1):
+            brute = rand_apply(lambda *args: sorted(args, reverse=True)[k - 1],
+                               *((die,) * n))
+            self.assertSameDistribution(order_statistic(die, k, n), brute)
+
+        # The 550th highest of 1100 dice is at most 3 exactly when at least
+        # 551 of the dice are, which by symmetry has probability
+        # (1 - C(1100, 550) / 2 ** 1100) / 2
+        middle = order_statistic(uniform(range(1, 7)), 550, 1100)
+        self.assertTrue(isclose(sum(middle.probs()), 1, rel_tol=1e-09))
+        low = Fraction(factorial(1100), factorial(550) ** 2 * 2 ** 1100)
+        self.assertTrue(isclose(middle[1] + middle[2] + middle[3],
+                                float((1 - low) / 2), rel_tol=1e-09))
+
+        with self.assertRaises(ValueError):
+            order_statistic(die, 0, 3)
+        with self.assertRaises(ValueError):
+            order_statistic(die, 4, 3)
+
+    def test_rand_max(self):
+        """
+        Tests `rand_max` on independent variables with overlapping supports
+        and a constant argument.
+        """
+
+        var1 = uniform(range(1, 7))
+        var2 = RandomVariable({0: 1, 3: 2, 8: 1})
+        brute = rand_apply(max, var1, var2, 2)
+        self.assertSameDistribution(rand_max(var1, var2, 2), brute)
+
+    def test_rand_min(self):
+        """
+        Tests `rand_min` on independent variables with overlapping supports
+        and a constant argument.
+        """
+
+        var1 = uniform(range(1, 7))
+        var2 = RandomVariable({0: 1, 3: 2, 8: 1})
+        brute = rand_apply(min, var1, var2, 5)
+        self.assertSameDistribution(rand_min(var1, var2, 5), brute)
+
+
+class TestCombinations(DistributionAssertions, unittest.TestCase):
+    """
+    Tests the functions `mixture` and `compound_sum`
+    """
+
+    def test_mixture(self):
+        """
+        Tests `mixture` by mixing overlapping variables and a constant with
+        unnormalized weights.
+        """
+
+        var1 = RandomVariable({0: 1, 1: 1})
+        var2 = RandomVariable({1: 1, 2: 3})
+        mixvar = mixture([(var1, 2), (var2, 1), ("x", 1), (var1, 0)])
+        self.assertSameDistribution(
+            mixvar, RandomVariable({0: 1 / 4, 1: 1 / 4 + 1 / 16, 2: 3 / 16,
+                                    "x": 1 / 4}))
+
+        with self.assertRaises(NegativeWeightError):
+            mixture([(var1, 1), (var2, -1)])
+
+    def test_compound_sum(self):
+        """
+        Tests `compound_sum` against a nested `rand_apply` enumeration of
+        the random count of terms.
+        """
+
+        count_var = poisson_trunc(1.5, 4)
+        term_var = RandomVariable({1: 2, 3: 1, 10: 1})
+
+        def partial_sum(count, *terms):
+            return sum(terms[:count])
+
+        brute = rand_apply(partial_sum, count_var, *((term_var,) * 4))
+        self.assertSameDistribution(compound_sum(count_var, term_var), brute)
+        self.assertSameDistribution(compound_sum(0, term_var), const(0))
+
+        with self.assertRaises(ValueError):
+            compound_sum(RandomVariable({-1: 1, 2: 1}), term_var)
+
+
+if __name__ == "__main__":
+    unittest.main()